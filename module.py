@@ -3,6 +3,8 @@
 import os
 import re
 import json
+import time
+import queue
 import asyncio
 import i3ipc
 import pynput
@@ -12,7 +14,8 @@ import configparser
 from loguru import logger
 from pynput import keyboard
 from string import Template
-from threading import Thread
+from threading import Event, Thread
+from concurrent.futures import ThreadPoolExecutor
 
 
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
@@ -22,10 +25,18 @@ SCROLL_COMMAND_PATH = os.path.join(SCRIPT_DIR, 'scroll.py')
 
 class TitleBar:
     def __init__(self, config_path='config.ini'):
-        self.hint = False
         self.hint2win = dict()
         self.win2hint = dict()
         self.hint_trie = None
+        self.hint_session = None
+
+        # Pre-rendered title bars of non-empty workspaces,
+        # keyed by workspace id with (signature, title bar) values
+        self.prerendered = dict()
+        self.prerender_event = Event()
+        self.prerender_tree = None
+        self.prerender_hits = 0
+        self.prerender_misses = 0
 
         self.config = configparser.ConfigParser()
         self.config.read(os.path.join(SCRIPT_DIR, 'default.ini'))
@@ -34,31 +45,55 @@ class TitleBar:
         self.tk = tkinter.Tk()
         self.keystroke_queue = []
 
+        # self.i3 only serves the subscription loop,
+        # commands and queries go through self.conn
+        self.conn = ConnectionManager()
         self.i3 = i3ipc.Connection()
         self.i3.on('window', self._refresh_title_bar)
         self.i3.on('window::focus', self._refresh_title_bar)
-        self.i3.on('workspace::focus', self._refresh_title_bar)
+        self.i3.on('workspace::focus', self._switch_title_bar)
 
     def launch_i3(self):
         t_i3 = Thread(target=self.i3.main)
         t_i3.start()
 
+        t_prerender = Thread(target=self.prerender_title_bars, daemon=True)
+        t_prerender.start()
+        self.schedule_prerender()
+
     def _refresh_title_bar(self, i3conn, event):
-        self.print_title_bar()
+        tree = self.conn.get_tree()
+        self.print_title_bar(tree=tree)
+        self.schedule_prerender(tree)
 
-    def get_title_bar(self):
-        tree = self.i3.get_tree()
+    def _switch_title_bar(self, i3conn, event):
+        title_bar = self.get_prerendered_title_bar(event.current)
+
+        if title_bar is None:
+            tree = self.conn.get_tree()
+            self.print_title_bar(tree=tree)
+            self.schedule_prerender(tree)
+        else:
+            print(title_bar, flush=True)
+            self.schedule_prerender()
+
+    def get_title_bar(self, tree=None, hint=False):
+        if tree is None:
+            tree = self.conn.get_tree()
         # Get current workspace
         focused = tree.find_focused()
         workspace = focused.workspace()
 
+        return self.render_title_bar(workspace, hint=hint)
+
+    def render_title_bar(self, workspace, hint=False):
         entries = []
         if len(workspace.nodes) == 1 and workspace.nodes[0].layout == 'tabbed':
             # Ensure first level nodes only contain the tabbed container
             tabbed_con = workspace.nodes[0]
-            entries = [ self.format_entry(node) for node in tabbed_con.nodes ]
+            entries = [ self.format_entry(node, hint=hint) for node in tabbed_con.nodes ]
         else:
-            entries = [ self.format_entry(node) for node in workspace.nodes ]
+            entries = [ self.format_entry(node, hint=hint) for node in workspace.nodes ]
 
         interval = "%{O"f"{self.config['title']['interval']}""}"
         title_bar = interval.join(entries)
@@ -68,28 +103,147 @@ class TitleBar:
 
         return title_bar
 
-    def print_title_bar(self, hint=False):
-        self.hint = hint
-        title_bar = self.get_title_bar()
+    def get_prerendered_title_bar(self, workspace):
+        '''Get the pre-rendered title bar of a workspace
+
+        Parameters
+        ----------
+        workspace: i3ipc.con.Con
+            A workspace object, such as the current workspace of a focus event.
+
+        Returns
+        -------
+        str or None
+            The cached title bar if it still matches the workspace, otherwise None.
+        '''
+
+        signature, title_bar = self.prerendered.get(workspace.id, (None, None))
+
+        if title_bar is not None and signature == self.get_workspace_signature(workspace):
+            self.prerender_hits += 1
+            logger.debug(f'Pre-render hit on workspace {workspace.name}')
+            return title_bar
+
+        self.prerender_misses += 1
+        logger.debug(f'Pre-render miss on workspace {workspace.name}')
+        return None
+
+    def schedule_prerender(self, tree=None):
+        '''Wake up the prerender thread
+
+        Parameters
+        ----------
+        tree: i3ipc.con.Con, optional
+            A tree already fetched by the caller. (default is None)
+            If None, the prerender thread fetches the tree itself.
+        '''
+
+        self.prerender_tree = tree
+        self.prerender_event.set()
+
+    def prerender_title_bars(self):
+        '''Keep title bars of non-empty workspaces rendered in the background
+
+        Each time it is woken up, it renders only the workspaces
+        whose signature has changed, reusing the tree handed over
+        by the event handler when there is one.
+        '''
+
+        while True:
+            self.prerender_event.wait()
+            self.prerender_event.clear()
+
+            tree = self.prerender_tree
+            self.prerender_tree = None
+            if tree is None:
+                tree = self.conn.get_tree()
+            prerendered = dict()
+
+            for workspace in tree.workspaces():
+                if not len(workspace.nodes):
+                    continue
+
+                signature = self.get_workspace_signature(workspace)
+                cached = self.prerendered.get(workspace.id)
+                if cached is not None and cached[0] == signature:
+                    prerendered[workspace.id] = cached
+                    continue
+
+                # Render an unfocused workspace as if it were focused,
+                # the last focused window gets focus when switching to it
+                if workspace.find_focused() is None:
+                    self.get_focus_leaf(workspace).focused = True
+                prerendered[workspace.id] = (signature, self.render_title_bar(workspace))
+
+            self.prerendered = prerendered
+
+    def get_workspace_signature(self, workspace):
+        '''Summarize everything of a workspace that its title bar depends on
+
+        Parameters
+        ----------
+        workspace: i3ipc.con.Con
+            A workspace object
+
+        Returns
+        -------
+        tuple
+            A hashable summary of the layout, windows and focus of the workspace.
+        '''
+
+        def sign(con):
+            return (con.id, con.layout, con.name, con.urgent,
+                    con.window_class, con.window_instance, con.window_title,
+                    tuple(sign(node) for node in con.nodes),
+                    tuple(sign(node) for node in con.floating_nodes))
+
+        # The focused con may be a container after `focus parent`,
+        # otherwise it is the window getting focus when switching to it
+        focused = workspace.find_focused()
+        if focused is None:
+            focused = self.get_focus_leaf(workspace)
+
+        return (sign(workspace), focused.id)
+
+    def get_focus_leaf(self, node):
+        '''Follow the focus stack down to the window focused last under a container
+        '''
+
+        while len(node.nodes) or len(node.floating_nodes):
+            children = {child.id: child for child in node.nodes + node.floating_nodes}
+            child = next((children[con_id] for con_id in node.focus if con_id in children), None)
+
+            if child is None:
+                break
+
+            node = child
+
+        return node
+
+    def print_title_bar(self, hint=False, tree=None):
+        if hint:
+            self.hint_session = self.start_hint_session()
+            tree = self.hint_session.tree
+        title_bar = self.get_title_bar(tree, hint=hint)
         print(title_bar, flush=True)
 
-    def format_entry(self, node):
+    def format_entry(self, node, hint=False):
         if len(node.nodes):
             # A container could contains many windows.
             # If a node has a list of nodes,
             # then it is a container.
-            entry = self.format_con(node)
+            entry = self.format_con(node, hint=hint)
         else:
-            entry = self.format_win(node)
+            entry = self.format_win(node, hint=hint)
 
         return entry
 
-    def format_con(self, con):
-        title = self.make_con_title(con)
+    def format_con(self, con, hint=False):
+        title = self.make_con_title(con, hint=hint)
 
         return title
 
-    def format_win(self, win, nested=False):
+    def format_win(self, win, nested=False, hint=False):
         '''Format the title of a window
 
         Parameters
@@ -99,6 +253,8 @@ class TitleBar:
         nested: bool, optional
             If the window is in a container. (default is False)
             If so, the window class is shown to follow i3 behavior.
+        hint: bool, optional
+            If the hint is painted before the title. (default is False)
 
         Returns
         -------
@@ -112,7 +268,7 @@ class TitleBar:
         title = self.paint_window_icon(win, title)
         title = self.paint_window_num(win, title)
 
-        if self.hint:
+        if hint:
             title = self.paint_window_hint(win, title)
 
         t = Template('%{A1:$left_command:}%{A4:$scroll_up_command:}%{A5:$scroll_down_command:}$title%{A}%{A}%{A}')
@@ -142,9 +298,9 @@ class TitleBar:
         else:
             return icon
 
-    def make_con_title(self, node):
+    def make_con_title(self, node, hint=False):
         if len(node.nodes):
-            title = ' '.join(self.make_con_title(n) for n in node.nodes)
+            title = ' '.join(self.make_con_title(n, hint=hint) for n in node.nodes)
             if node.layout == 'splith':
                 title = f'H[{title}]'
             elif node.layout == 'splitv':
@@ -157,7 +313,7 @@ class TitleBar:
                 title = 'not supported'
             return title
         else:
-            return self.format_win(node, nested=True)
+            return self.format_win(node, nested=True, hint=hint)
 
     def make_title(self, win, nested=False):
         window_class = win.window_class if win.window_class \
@@ -289,17 +445,10 @@ class TitleBar:
         if isNum:
             return title
 
-        wins = []
-        for workspace in self.get_visible_workspaces():
-            wins += self.get_leaf_nodes(workspace)
-        win_ids = [win.id for win in wins]
-        num = win_ids.index(win.id) + 1
+        hint = self.win2hint.get(win.id)
 
-        hints = self.get_hint_strings(len(wins))
-        self.hint2win = dict(zip(hints, win_ids))
-        self.win2hint = dict(zip(win_ids, hints))
-        self.hint_trie = self.get_hint_trie(hints)
-        hint = hints[num - 1]
+        if hint is None:
+            return title
 
         fcolor = self.config['color']['focused-window-hint-foreground-color'] if win.focused \
             else self.config['color']['urgent-window-hint-foreground-color'] if win.urgent  \
@@ -330,15 +479,12 @@ class TitleBar:
 
         self.tk.configure(bg='')
 
-        wins = []
-        for workspace in self.get_visible_workspaces():
-            wins += workspace.leaves()
-        visible_wins = [win for win in wins if self.get_container_visibility(win)]
-        focused_win = self.i3.get_tree().find_focused()
+        session = self.hint_session
+        visible_wins = session.visible_wins
 
         if len(visible_wins) > 1:
             for win in visible_wins:
-                if win.id == focused_win.id:
+                if win.id == session.focused.id:
                     continue
                 hint = self.win2hint[win.id]
                 label = tkinter.Label(text=hint, font=("", 60))
@@ -361,7 +507,7 @@ class TitleBar:
 
         self.tk.configure(bg='')
 
-        workspaces = [workspace for workspace in self.i3.get_tree().workspaces()
+        workspaces = [workspace for workspace in self.conn.get_tree().workspaces()
                       if len(workspace.nodes)]
         # Leaves are not always application windows
         wins = []
@@ -396,8 +542,7 @@ class TitleBar:
             win_id = self.hint2win[hint]
             self.keystroke_queue = []
             self.tk.destroy()
-            win = self.i3.get_tree().find_by_id(win_id)
-            win.command('focus')
+            self.focus_window(win_id)
 
         # The window content
         for j in range(ncol):
@@ -467,33 +612,84 @@ class TitleBar:
 
         return list(map(lambda s: s[::-1], sorted(hints)))
 
-    def get_visible_workspaces(self):
-        visible_workspace_names = [output.current_workspace for output in self.i3.get_outputs()
+    def get_visible_workspaces(self, tree, outputs):
+        visible_workspace_names = [output.current_workspace for output in outputs
                                    if output.current_workspace]
 
         # visible_workspace_ids = [workspace.id for workspace in self.i3.get_workspaces()
         #                          if workspace.visible]
 
-        visible_workspaces = [workspace for workspace in self.i3.get_tree().workspaces()
+        visible_workspaces = [workspace for workspace in tree.workspaces()
                               if workspace.name in visible_workspace_names]
         return visible_workspaces
 
-    def get_container_visibility(self, container):
-        '''Check the visibility of a container
+    def get_visible_win_ids(self, workspace):
+        '''Collect ids of visible containers under a workspace in one top-down pass
         from con_is_hidden function in https://github.com/i3/i3/blob/master/src/con.c
+
+        A child of a tabbed or stacked container is only visible
+        when it is the first in the focus list of its parent.
+        Hidden containers are not descended into.
+
+        Parameters
+        ----------
+        workspace: i3ipc.con.Con
+            A workspace object
+
+        Returns
+        -------
+        set
+            Ids of all visible containers under the workspace.
+        '''
+
+        visible_ids = set()
+        stack = [workspace]
+
+        while stack:
+            parent = stack.pop()
+            front_id = next(iter(parent.focus), None)
+            is_stacked = parent.layout == 'tabbed' or parent.layout == 'stacked'
+
+            for child in parent.nodes + parent.floating_nodes:
+                if is_stacked and child.id != front_id:
+                    continue
+                visible_ids.add(child.id)
+                stack.append(child)
+
+        return visible_ids
+
+    def start_hint_session(self):
+        '''Take a snapshot of i3 state for a hint session.
+
+        The tree and outputs are fetched once at activation,
+        everything the title bar and the on screen hints need
+        is computed from them.
+
+        Returns
+        -------
+        HintSession
+            The snapshot of the session.
         '''
-        current = container
 
-        while current != None and current.type != 'workspace':
-            parent = current.parent
+        tree, outputs = self.conn.gather(('get_tree',), ('get_outputs',))
+        workspaces = self.get_visible_workspaces(tree, outputs)
+
+        win_ids = []
+        visible_wins = []
+        for workspace in workspaces:
+            win_ids += [win.id for win in self.get_leaf_nodes(workspace)]
+            visible_ids = self.get_visible_win_ids(workspace)
+            visible_wins += [win for win in workspace.leaves() if win.id in visible_ids]
 
-            if (parent != None and (parent.layout == 'tabbed' or parent.layout == 'stacked')) :
-                if (next(iter(parent.focus), None) != current.id):
-                    return False
+        hints = self.get_hint_strings(len(win_ids))
+        self.hint2win = dict(zip(hints, win_ids))
+        self.win2hint = dict(zip(win_ids, hints))
+        self.hint_trie = self.get_hint_trie(hints)
 
-            current = parent
+        return HintSession(tree, tree.find_focused(), visible_wins)
 
-        return True
+    def focus_window(self, win_id):
+        self.conn.command(f'[con_id={win_id}] focus')
 
     def get_hint_trie(self, hints):
         hint_trie = HintTrie()
@@ -520,12 +716,104 @@ class TitleBar:
             win_id = self.hint2win[''.join(self.keystroke_queue)]
             self.keystroke_queue = []
             self.tk.destroy()
-            win = self.i3.get_tree().find_by_id(win_id)
-            win.command('focus')
+            self.focus_window(win_id)
         else:
             pass
 
 
+class ConnectionManager:
+    '''Connections to i3 dedicated to commands and queries
+
+    Requests are served by a small pool of connections kept apart
+    from the one running the subscription loop, so they are never
+    serialized with event dispatch. Independent requests can be
+    issued concurrently with `gather`.
+
+    Parameters
+    ----------
+    size: int, optional
+        Number of connections in the pool. (default is 2)
+    '''
+
+    def __init__(self, size=2):
+        self.pool = queue.Queue()
+        for _ in range(size):
+            self.pool.put(i3ipc.Connection())
+        self.executor = ThreadPoolExecutor(max_workers=size)
+        # Latency in seconds of the last request of each kind
+        self.latency = dict()
+
+    def request(self, method, *args):
+        '''Issue a request on a free connection of the pool
+
+        Parameters
+        ----------
+        method: str
+            Name of the i3ipc.Connection method, such as get_tree.
+        args:
+            Arguments passed to the method.
+
+        Returns
+        -------
+        The reply of the request.
+        '''
+
+        conn = self.pool.get()
+        start = time.perf_counter()
+        try:
+            return getattr(conn, method)(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.pool.put(conn)
+            self.latency[method] = elapsed
+            logger.debug(f'{method} took {elapsed * 1000:.2f}ms')
+
+    def gather(self, *requests):
+        '''Issue independent requests concurrently
+
+        Parameters
+        ----------
+        requests: tuple
+            Each request is a tuple of method name and its arguments.
+
+        Returns
+        -------
+        list
+            Replies in the same order as the requests.
+        '''
+
+        futures = [self.executor.submit(self.request, *request) for request in requests]
+        return [future.result() for future in futures]
+
+    def get_tree(self):
+        return self.request('get_tree')
+
+    def get_outputs(self):
+        return self.request('get_outputs')
+
+    def command(self, payload):
+        return self.request('command', payload)
+
+
+class HintSession:
+    '''State of i3 captured when a hint is activated
+
+    Parameters
+    ----------
+    tree: i3ipc.con.Con
+        The root container of the snapshot.
+    focused: i3ipc.con.Con
+        The focused window in the snapshot.
+    visible_wins: list
+        Windows visible on screen in the snapshot.
+    '''
+
+    def __init__(self, tree, focused, visible_wins):
+        self.tree = tree
+        self.focused = focused
+        self.visible_wins = visible_wins
+
+
 class HintTrie:
     def __init__(self):
         self.children = {}